@@ -276,6 +276,34 @@ class QdConf:
         except KeyError:
             raise KeyError(f"Configuration key not found: {key}")
 
+    def __contains__(self, key):
+        """
+        Check whether a configuration key is set, without raising.
+
+        Args:
+            key: Dot-notation key (e.g., 'email.MAIL_SERVER')
+
+        Returns:
+            True if key resolves to a value, False otherwise
+
+        Example:
+            if 'email.MAIL_SERVER' in conf:
+                server = conf['email.MAIL_SERVER']
+        """
+        if not key or not isinstance(key, str):
+            return False
+
+        parts = key.split('.')
+        if len(parts) < 2:
+            return False
+
+        current = self._load_file(parts[0])
+        for part in parts[1:]:
+            if not isinstance(current, dict) or part not in current:
+                return False
+            current = current[part]
+        return True
+
     def __setitem__(self, key, value):
         """
         Set configuration value and mark file as dirty.
@@ -7,12 +7,18 @@ qdo_* functions. Stores results in /conf/repos.db for quick lookup.
 Supports both persistent and in-memory database modes for bootstrapping.
 """
 
+import hashlib
+import inspect
 import json
 import os
 import ast
 import re
 import sqlite3
+import sys
+import threading
 import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
 from qdbase import exenv 
@@ -65,10 +71,41 @@ CREATE TABLE IF NOT EXISTS flask_init (
     UNIQUE(package, module, function)
 );
 
+CREATE TABLE IF NOT EXISTS qdo_cache (
+    path TEXT PRIMARY KEY,
+    sha256 BLOB NOT NULL,
+    qdo_json TEXT NOT NULL,
+    stat_key BLOB,
+    flask_flags INTEGER
+);
+
 CREATE INDEX IF NOT EXISTS idx_qdo_function ON qdo(function_name);
-CREATE INDEX IF NOT EXISTS idx_flask_init_priority ON flask_init(priority);
+
+-- Match the WHERE/ORDER BY of get_installable_packages() and the
+-- enabled filter and priority ordering of get_flask_init_sequence()
+CREATE INDEX IF NOT EXISTS idx_packages_has_setup_pkg
+    ON packages(has_setup, package);
+CREATE INDEX IF NOT EXISTS idx_packages_enabled_pkg
+    ON packages(enabled, package);
+DROP INDEX IF EXISTS idx_flask_init_priority;
+CREATE INDEX IF NOT EXISTS idx_flask_init_prio_pkg
+    ON flask_init(priority, package);
 '''
 
+# Stored in PRAGMA user_version once connect() has created the schema and
+# run the migrations. Bump it whenever SCHEMA, the conf tables or the
+# migrations in RepoScanner._create_schema() change.
+SCHEMA_VERSION = 2
+
+# Per-connection tuning: repos.db is a rebuildable cache, so trading
+# fsyncs for write throughput is acceptable.
+_CONNECT_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',  # KiB, i.e. ~20 MB
+    'PRAGMA mmap_size=268435456',  # read pages via mmap, up to 256 MB
+)
+
 CONF_TYPE_BASENAME = 'basename'
 CONF_TYPE_BOOLEAN = 'boolean'
 CONF_TYPE_DIRECTORY_PATH = 'dpath'
@@ -80,6 +117,17 @@ VALID_CONF_TYPES = [CONF_TYPE_BASENAME, CONF_TYPE_BOOLEAN,
                     CONF_TYPE_RANDOM_FILL, CONF_TYPE_STRING]
 
 
+def _intern_conf_type(conf_type):
+    """
+    Intern conf_type strings read from TOML or the database so the
+    is_* comparisons against CONF_TYPE_* constants hit the identity
+    fast path.
+    """
+    if isinstance(conf_type, str):
+        return sys.intern(conf_type)
+    return conf_type
+
+
 class ConfQuestion:
     __slots__ = ('conf_type', 'conf_key', 'conf_help', 'yaml_path')
 
@@ -92,7 +140,7 @@ class ConfQuestion:
     @classmethod
     def from_row(cls, row):
         """Create from sqlite3.Row."""
-        return cls(row['conf_type'], row['conf_key'],
+        return cls(_intern_conf_type(row['conf_type']), row['conf_key'],
                    row['conf_help'], row['yaml_path'])
 
     @classmethod
@@ -100,7 +148,8 @@ class ConfQuestion:
         """Create from a qd_conf.toml question dict."""
         conf_type = question_dict.get('conf_type', CONF_TYPE_STRING)
         conf_help = question_dict.get('help', '')
-        return cls(conf_type, conf_key, conf_help, yaml_path)
+        return cls(_intern_conf_type(conf_type), conf_key, conf_help,
+                   yaml_path)
 
     @property
     def is_boolean(self):
@@ -125,7 +174,7 @@ class ConfQuestion:
 
     @staticmethod
     def create_table(cursor):
-        """Create conf_questions table + index."""
+        """Create conf_questions table."""
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS conf_questions (
                 id INTEGER PRIMARY KEY,
@@ -135,10 +184,9 @@ class ConfQuestion:
                 conf_type TEXT
             )
         ''')
-        cursor.execute(
-            'CREATE INDEX IF NOT EXISTS idx_conf_questions_key '
-            'ON conf_questions(conf_key)'
-        )
+        # conf_key UNIQUE already indexes it; drop the duplicate index
+        # older databases have, which every insert had to maintain too
+        cursor.execute('DROP INDEX IF EXISTS idx_conf_questions_key')
 
     def select_by_key(self, cursor):
         cursor.execute(
@@ -154,6 +202,25 @@ class ConfQuestion:
             (self.yaml_path, self.conf_key, self.conf_help, self.conf_type)
         )
 
+    @staticmethod
+    def insert_many(cursor, questions):
+        """
+        Insert questions, skipping any whose conf_key already exists.
+
+        Returns:
+            Count of questions inserted
+        """
+        if not questions:
+            return 0
+        cursor.executemany(
+            '''INSERT OR IGNORE INTO conf_questions
+               (yaml_path, conf_key, conf_help, conf_type)
+               VALUES (?, ?, ?, ?)''',
+            [(q.yaml_path, q.conf_key, q.conf_help, q.conf_type)
+             for q in questions]
+        )
+        return cursor.rowcount
+
     def build_prompt(self):
         """Build user prompt string from conf_help and conf_key."""
         if self.conf_help:
@@ -166,6 +233,10 @@ SOURCE_CONSTANT = "constant"      # From qd_conf.toml answers section
 SOURCE_CONFIGURED = "configured"  # From existing conf/*.toml
 SOURCE_PROMPT = "prompt"          # Will need to prompt user
 
+# String answers that mean "disabled"; all are at most 5 characters
+_DISABLED_STRS = frozenset(('false', 'no', '0', 'n'))
+_DISABLED_STR_MAXLEN = 5
+
 _REF_PATTERN = re.compile(r'<([a-zA-Z_][a-zA-Z0-9_.]+)>')
 
 
@@ -192,16 +263,39 @@ def expand_answer_refs(value, answer_cache, conf=None):
         ref_key = match.group(1)
         if ref_key in answer_cache:
             return str(answer_cache[ref_key])
-        if conf:
-            try:
-                return str(conf[ref_key])
-            except (KeyError, ValueError):
-                pass
+        if conf and ref_key in conf:
+            return str(conf[ref_key])
         return match.group(0)
 
     return _REF_PATTERN.sub(replacer, value)
 
 
+def _walk_leaves(obj, is_leaf=None):
+    """
+    Yield (conf_key, value) for the leaves of a nested dict, in order.
+
+    A leaf is any non-dict value, or a dict for which is_leaf(value) is
+    true. conf_key is the dotted path of keys leading to the leaf. Uses
+    an explicit stack, so deep nesting costs no Python frames.
+    """
+    stack = [(None, obj)]
+    while stack:
+        conf_key, value = stack.pop()
+        if isinstance(value, dict) and not (is_leaf and is_leaf(value)):
+            # Reversed so entries come off the stack in document order
+            stack.extend(
+                (k if conf_key is None else f'{conf_key}.{k}', v)
+                for k, v in reversed(value.items())
+            )
+        else:
+            yield ('' if conf_key is None else conf_key), value
+
+
+def _is_question_leaf(obj):
+    """Check if this dict is a question definition (has help or conf_type)."""
+    return 'help' in obj or 'conf_type' in obj
+
+
 def has_unresolved_refs(value):
     """Return True if the string still contains <conf_key> references."""
     return isinstance(value, str) and bool(_REF_PATTERN.search(value))
@@ -245,18 +339,14 @@ class ConfAnswer:
             return cls(conf_key, answer_cache[conf_key],
                        source=SOURCE_CONSTANT)
 
-        if conf:
-            try:
-                existing = conf[conf_key]
-                return cls(conf_key, existing, source=SOURCE_CONFIGURED)
-            except KeyError:
-                pass
+        if conf and conf_key in conf:
+            return cls(conf_key, conf[conf_key], source=SOURCE_CONFIGURED)
 
         return cls(conf_key, None, source=SOURCE_PROMPT)
 
     @staticmethod
     def create_table(cursor):
-        """Create conf_answers table + index."""
+        """Create conf_answers table."""
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS conf_answers (
                 id INTEGER PRIMARY KEY,
@@ -265,10 +355,8 @@ class ConfAnswer:
                 conf_value TEXT
             )
         ''')
-        cursor.execute(
-            'CREATE INDEX IF NOT EXISTS idx_conf_answers_key '
-            'ON conf_answers(conf_key)'
-        )
+        # See ConfQuestion.create_table()
+        cursor.execute('DROP INDEX IF EXISTS idx_conf_answers_key')
 
     def select_by_key(self, cursor):
         cursor.execute(
@@ -284,6 +372,18 @@ class ConfAnswer:
             (self.yaml_path, self.conf_key, self.db_value)
         )
 
+    @staticmethod
+    def insert_many(cursor, answers):
+        """Insert answers, skipping any whose conf_key already exists."""
+        if not answers:
+            return
+        cursor.executemany(
+            '''INSERT OR IGNORE INTO conf_answers
+               (yaml_path, conf_key, conf_value)
+               VALUES (?, ?, ?)''',
+            [(a.yaml_path, a.conf_key, a.db_value) for a in answers]
+        )
+
     def update_value(self, cursor):
         """Update conf_value in database."""
         cursor.execute(
@@ -310,7 +410,8 @@ class ConfAnswer:
         if isinstance(self.conf_value, bool):
             return not self.conf_value
         if isinstance(self.conf_value, str):
-            return self.conf_value.lower() in ('false', 'no', '0', 'n')
+            return (len(self.conf_value) <= _DISABLED_STR_MAXLEN
+                    and self.conf_value.lower() in _DISABLED_STRS)
         return False
 
     @property
@@ -320,6 +421,7 @@ class ConfAnswer:
 
 
 EDITABLE_PREFIX = 'e::'
+_EDITABLE_PREFIX_LEN = len(EDITABLE_PREFIX)
 
 
 class RepoSpec:
@@ -334,16 +436,284 @@ class RepoSpec:
     def parse(cls, entry):
         if isinstance(entry, cls):
             return entry
-        entry = str(entry)
+        if not isinstance(entry, str):
+            entry = str(entry)
         if entry.startswith(EDITABLE_PREFIX):
-            return cls(path=entry[len(EDITABLE_PREFIX):], editable=True)
-        return cls(path=entry, editable=False)
+            return cls(entry[_EDITABLE_PREFIX_LEN:], True)
+        return cls(entry, False)
 
     def __repr__(self):
         prefix = EDITABLE_PREFIX if self.editable else ''
         return f"RepoSpec('{prefix}{self.path}')"
 
 
+def _read_toml(toml_path):
+    """
+    Parse a TOML file.
+
+    Args:
+        toml_path: Path to the TOML file
+
+    Returns:
+        Parsed dict
+
+    Raises:
+        OSError, UnicodeDecodeError, tomllib.TOMLDecodeError
+    """
+    with open(toml_path, 'rb') as f:
+        return tomllib.load(f)
+
+
+# Files whose presence makes a directory installable
+_SETUP_MARKERS = ('setup.py', 'pyproject.toml')
+
+# Package modules checked for Flask app/blueprint markers
+_FLASK_FILES = ('__init__.py', 'app.py', 'routes.py', 'views.py')
+
+# Flask app/blueprint markers: "flask.Flask", "Flask(", "flask.Blueprint",
+# "Blueprint(". Group 1 or 2 holds the class name.
+_FLASK_MARKER_RE = re.compile(rb'flask\.(Flask|Blueprint)|(Flask|Blueprint)\(')
+
+# Bits of a _flask_flags() result
+_FLASK_APP = 1
+_FLASK_BLUEPRINT = 2
+
+
+def _flask_flags(source):
+    """
+    Return _FLASK_APP/_FLASK_BLUEPRINT bits for the markers in source.
+    """
+    flags = 0
+    for match in _FLASK_MARKER_RE.finditer(source):
+        if (match.group(1) or match.group(2)) == b'Flask':
+            flags |= _FLASK_APP
+        else:
+            flags |= _FLASK_BLUEPRINT
+        if flags == _FLASK_APP | _FLASK_BLUEPRINT:
+            break
+    return flags
+
+
+# Directory names never descended into by _walk_repo_dirs() (besides
+# names starting with '.' or '_') or _scandir_py()
+_PRUNED_DIRS = frozenset(('build', 'dist', 'node_modules'))
+
+
+def _scandir_py(dpath):
+    """
+    Yield the str paths of all .py files below dpath.
+
+    Uses os.scandir so file/dir checks come from the cached directory
+    entry instead of a stat() per file. Symlinked directories are not
+    followed; symlinked .py files are included, as rglob() did.
+    Hidden directories, __pycache__, _PRUNED_DIRS and virtualenvs are
+    not descended into; underscore-prefixed subpackages still are.
+
+    Walks with an explicit stack of entry iterators rather than nested
+    generators, so each path is yielded once instead of being passed up
+    through every directory level, in the same depth-first order.
+    """
+    stack = [iter(_list_dir(dpath))]
+    while stack:
+        for entry in stack[-1]:
+            name = entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if (name[0] == '.' or name == '__pycache__'
+                        or name in _PRUNED_DIRS
+                        or os.path.exists(
+                            os.path.join(entry.path, 'pyvenv.cfg'))):
+                    continue
+                # Descend now; the rest of this directory resumes after
+                stack.append(iter(_list_dir(entry.path)))
+                break
+            if name.endswith('.py') and entry.is_file():
+                yield entry.path
+        else:
+            stack.pop()
+
+
+def _list_dir(dpath):
+    """os.scandir entries of dpath as a list; empty if it can't be read."""
+    try:
+        with os.scandir(dpath) as it:
+            return list(it)
+    except OSError:
+        return []
+
+
+def _walk_repo_dirs(top):
+    """
+    Yield (dirpath, filenames) for top and the directories below it.
+
+    Same pre-order as os.walk(top), with pruning applied while listing:
+    hidden and underscore directories, _PRUNED_DIRS, virtualenvs (a
+    pyvenv.cfg inside) and symlinked directories are skipped. Each
+    directory is listed with one os.scandir pass; filenames is a
+    frozenset of the non-directory entry names.
+    """
+    stack = [top]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        subdirs = []
+        filenames = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                filenames.append(entry.name)
+                continue
+            name = entry.name
+            if (name[0] in '._' or name in _PRUNED_DIRS
+                    or entry.is_symlink()
+                    or os.path.exists(os.path.join(entry.path, 'pyvenv.cfg'))):
+                continue
+            subdirs.append(entry.path)
+        yield dirpath, frozenset(filenames)
+        stack.extend(reversed(subdirs))
+
+
+# Mixed into qdo_cache hashes: extraction output can differ between
+# Python versions, so a new interpreter invalidates the cache. Bump
+# _QDO_CACHE_VERSION whenever _parse_qdo_functions() output changes.
+_QDO_CACHE_VERSION = 3
+_QDO_CACHE_SALT = ('%d:%d.%d\0' % ((_QDO_CACHE_VERSION,)
+                                   + sys.version_info[:2])).encode()
+
+
+# A def of a qdo_* function, at any indentation; the optional UTF-8 BOM
+# lets a def on the first line of a file saved with one match too
+_QDO_DEF_RE = re.compile(rb'^(?:\xef\xbb\xbf)?[ \t]*def[ \t]+qdo_',
+                         re.MULTILINE)
+
+
+def _qdo_cache_digest(source):
+    """SHA-256 of a source file's bytes, salted with the Python version."""
+    return hashlib.sha256(_QDO_CACHE_SALT + source).digest()
+
+
+def _qdo_stat_key(st):
+    """
+    qdo_cache stat key: mtime and size, salted like the digest so a new
+    interpreter doesn't trust entries written by an old one.
+    """
+    return _QDO_CACHE_SALT + b'%d:%d' % (st.st_mtime_ns, st.st_size)
+
+
+def _may_define_qdo(source):
+    """
+    Check whether source bytes might define qdo_* functions.
+
+    Most modules define none; a substring test is far cheaper than
+    hashing or parsing them. Modules that only mention qdo_ (callers,
+    registries) are screened out by a line-anchored regex for the def.
+    """
+    return b'qdo_' in source and _QDO_DEF_RE.search(source) is not None
+
+
+def _parse_qdo_functions(source):
+    """
+    Extract qdo_* functions from Python source using AST.
+
+    Args:
+        source: Source code as bytes or str
+
+    Returns:
+        List of dicts with function info
+    """
+    functions = []
+
+    try:
+        # What ast.parse() does, minus its wrapper and feature-version
+        # handling
+        tree = compile(source, '<unknown>', 'exec', ast.PyCF_ONLY_AST,
+                       dont_inherit=True)
+    except Exception:
+        return functions
+
+    # qdo_* functions are module-level or class-level definitions;
+    # there is no need to descend into function bodies.
+    nodes = list(tree.body)
+    for class_node in tree.body:
+        if isinstance(class_node, ast.ClassDef):
+            nodes.extend(class_node.body)
+
+    for node in nodes:
+        if isinstance(node, ast.FunctionDef):
+            if node.name.startswith('qdo_'):
+                func_info = {
+                    'name': node.name,
+                    'parameters': _get_function_parameters(node),
+                    'docstring': _get_docstring(node)
+                }
+                functions.append(func_info)
+
+    return functions
+
+
+def _get_docstring(func_node):
+    """
+    Return a function's cleaned docstring, or '' if it has none.
+
+    Same result as ast.get_docstring(func_node) or '', but single-line
+    docstrings skip inspect.cleandoc, which reduces to an lstrip for them.
+    """
+    if not func_node.body:
+        return ''
+    first = func_node.body[0]
+    if not (isinstance(first, ast.Expr)
+            and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str)):
+        return ''
+    doc = first.value.value
+    if '\n' in doc:
+        return inspect.cleandoc(doc)
+    return doc.expandtabs().lstrip()
+
+
+def _get_function_parameters(func_node):
+    """
+    Extract parameter information from a function AST node.
+
+    The signature is rendered as written (annotations, positional-only
+    and keyword-only markers, defaults) by ast.unparse.
+
+    Args:
+        func_node: AST FunctionDef node
+
+    Returns:
+        String describing the parameters
+    """
+    return ast.unparse(func_node.args)
+
+
+# Upper bound on threads used for the filesystem pass of scan_directories()
+SCAN_MAX_WORKERS = 8
+
+
+class _RepoScan:
+    """Filesystem scan results for one repository, before they hit the DB."""
+    __slots__ = ('repo_path', 'editable', 'package_rows', 'qdo_rows',
+                 'unreadable_paths', 'conf_tomls', 'installable_packages')
+
+    def __init__(self, repo_path, editable=False):
+        self.repo_path = repo_path
+        self.editable = editable
+        self.package_rows = []
+        self.qdo_rows = []
+        # .py files that couldn't be stat()ed or read; their existing qdo
+        # rows are kept (see _delete_stale_qdo())
+        self.unreadable_paths = []
+        self.conf_tomls = []
+        self.installable_packages = []
+
+
 class RepoScanner:
     """
     Scans repositories for packages and qdo_* functions.
@@ -367,6 +737,20 @@ class RepoScanner:
         self.db_path = self.conf_path / 'repos.db'
         self.in_memory = in_memory
         self._conn = None
+        self._cursor = None
+        # path -> (sha256, qdo_json, stat_key, flask_flags);
+        # see _probe_qdo_file()
+        self._qdo_cache = {}
+        self._qdo_cache_dirty = set()
+        # Paths probed during the current scan; see _store_qdo_cache()
+        self._qdo_cache_seen = set()
+        # str path -> bool; see _find_setup()
+        self._setup_probe_cache = {}
+        # path str -> ((st_mtime_ns, st_size), data); see _read_qd_conf_toml()
+        self._conf_toml_cache = {}
+        # conf_questions keys, loaded by _process_questions_section() and
+        # dropped at the end of each scan
+        self._question_keys = None
         self.connect(in_memory=self.in_memory, no_db=no_db)
 
     def connect(self, in_memory=False, no_db=False):
@@ -383,36 +767,67 @@ class RepoScanner:
         else:
             self.conf_path.mkdir(parents=True, exist_ok=True)
             self._conn = sqlite3.connect(str(self.db_path))
-        cursor = self._conn.cursor()
+        # Shared cursor for plain-tuple queries; methods that need
+        # sqlite3.Row results use _row_cursor().
+        self._cursor = cursor = self._conn.cursor()
+        if not self.in_memory:
+            # WAL is persistent and not applicable to :memory:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        for pragma in _CONNECT_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] < SCHEMA_VERSION:
+            self._create_schema(cursor)
+        return self._conn
+
+    def _create_schema(self, cursor):
+        """
+        Create tables and indexes, migrate older databases and add the
+        default questions, then stamp PRAGMA user_version so later
+        connections skip all of it.
+        """
         cursor.executescript(SCHEMA)
-        ConfQuestion.create_table(cursor)
-        ConfAnswer.create_table(cursor)
-        self._conn.commit()
+        # Table setup, migrations and default questions commit together
+        with self._transaction():
+            ConfQuestion.create_table(cursor)
+            ConfAnswer.create_table(cursor)
 
-        # Migrate older databases that lack the editable column
-        try:
-            cursor.execute(
-                'ALTER TABLE repositories ADD COLUMN editable INTEGER DEFAULT 0'
-            )
-        except sqlite3.OperationalError:
-            pass
-        try:
-            cursor.execute(
-                'ALTER TABLE packages ADD COLUMN editable INTEGER DEFAULT 0'
-            )
-        except sqlite3.OperationalError:
-            pass
-        try:
-            cursor.execute(
-                'ALTER TABLE packages ADD COLUMN setup_path TEXT'
-            )
-        except sqlite3.OperationalError:
-            pass
-        self._conn.commit()
+            # Migrate older databases that lack the editable column
+            try:
+                cursor.execute(
+                    'ALTER TABLE repositories ADD COLUMN editable INTEGER '
+                    'DEFAULT 0'
+                )
+            except sqlite3.OperationalError:
+                pass
+            try:
+                cursor.execute(
+                    'ALTER TABLE packages ADD COLUMN editable INTEGER DEFAULT 0'
+                )
+            except sqlite3.OperationalError:
+                pass
+            try:
+                cursor.execute(
+                    'ALTER TABLE packages ADD COLUMN setup_path TEXT'
+                )
+            except sqlite3.OperationalError:
+                pass
+            try:
+                cursor.execute(
+                    'ALTER TABLE qdo_cache ADD COLUMN stat_key BLOB'
+                )
+            except sqlite3.OperationalError:
+                pass
+            try:
+                cursor.execute(
+                    'ALTER TABLE qdo_cache ADD COLUMN flask_flags INTEGER'
+                )
+            except sqlite3.OperationalError:
+                pass
 
-        # Add default site questions if they don't exist
-        self._add_default_questions(cursor)
-        return self._conn
+            # Add default site questions if they don't exist
+            self._add_default_questions(cursor)
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
 
     def _add_default_questions(self, cursor):
         """Add default site configuration questions if they don't exist."""
@@ -423,11 +838,7 @@ class RepoScanner:
                          "Path to site root directory.")
         ]
 
-        for this_question in default_questions:
-            this_question.select_by_key(cursor)
-            if cursor.fetchone() is None:
-                this_question.insert(cursor)
-        self._conn.commit()
+        ConfQuestion.insert_many(cursor, default_questions)
 
     def backup_to_file(self, db_path=None):
         """
@@ -460,6 +871,7 @@ class RepoScanner:
         if self._conn:
             self._conn.close()
             self._conn = None
+            self._cursor = None
 
     def load_answer_files(self, answer_file_list):
         """
@@ -476,10 +888,7 @@ class RepoScanner:
         if not answer_file_list:
             return 0
 
-        if self._conn is None:
-            cursor = None
-        else:
-            cursor = self._conn.cursor()
+        cursor = self._cursor
         count = 0
 
         for toml_path in answer_file_list:
@@ -498,8 +907,7 @@ class RepoScanner:
         answer = ConfAnswer(answer_key, answer_value)
         self.answer_cache[answer_key] = answer.db_value
         if self._conn is not None:
-            cursor = self._conn.cursor()
-            answer.update_value(cursor)
+            answer.update_value(self._cursor)
             self._conn.commit()
 
     def post_answer(self, answer_key, answer_value, cursor, yaml_path_str):
@@ -512,6 +920,28 @@ class RepoScanner:
         answer.insert(cursor)
         return 1
 
+    def post_answers(self, items, cursor, yaml_path_str):
+        """
+        Post (answer_key, answer_value) pairs with one executemany.
+
+        Same first-answer-wins rule as post_answer().
+
+        Returns:
+            Count of answers added
+        """
+        answer_cache = self.answer_cache
+        answers = []
+        for answer_key, answer_value in items:
+            if answer_key in answer_cache:
+                continue
+            answer = ConfAnswer(answer_key, answer_value,
+                                yaml_path=yaml_path_str)
+            answer_cache[answer_key] = answer.db_value
+            answers.append(answer)
+        if cursor is not None:
+            ConfAnswer.insert_many(cursor, answers)
+        return len(answers)
+
     def _load_answers_from_toml(self, cursor, toml_path):
         """
         Load answers from a single TOML file.
@@ -526,59 +956,39 @@ class RepoScanner:
         Returns:
             Count of answers loaded
         """
-        with open(toml_path, 'rb') as f:
-            try:
-                data = tomllib.load(f)
-            except tomllib.TOMLDecodeError as e:
-                error_msg = str(e)
-                msg = f"TOML syntax error in {toml_path}"
-                # Extract line number from message like "(at line 5, column 1)"
-                match = re.search(r'at line (\d+)', error_msg)
-                if match:
-                    line_num = int(match.group(1))
-                    msg += f", line {line_num}"
-                    try:
-                        with open(toml_path, 'r') as tf:
-                            lines = tf.readlines()
-                            if 0 < line_num <= len(lines):
-                                msg += f":\n  {lines[line_num - 1].rstrip()}"
-                    except (OSError, UnicodeDecodeError):
-                        pass
-                msg += f"\n{error_msg}"
-                raise ValueError(msg) from e
+        try:
+            data = _read_toml(toml_path)
+        except tomllib.TOMLDecodeError as e:
+            error_msg = str(e)
+            msg = f"TOML syntax error in {toml_path}"
+            # Extract line number from message like "(at line 5, column 1)"
+            match = re.search(r'at line (\d+)', error_msg)
+            if match:
+                line_num = int(match.group(1))
+                msg += f", line {line_num}"
+                try:
+                    with open(toml_path, 'r') as tf:
+                        lines = tf.readlines()
+                        if 0 < line_num <= len(lines):
+                            msg += f":\n  {lines[line_num - 1].rstrip()}"
+                except (OSError, UnicodeDecodeError):
+                    pass
+            msg += f"\n{error_msg}"
+            raise ValueError(msg) from e
 
         if not data or not isinstance(data, dict):
             return 0
 
-        count = 0
-        toml_path_str = str(toml_path)
-
-        def traverse(obj, key_parts):
-            nonlocal count
-            if isinstance(obj, dict):
-                # Check if this is a leaf or container
-                has_nested = any(isinstance(v, dict) for v in obj.values())
-                if has_nested:
-                    for k, v in obj.items():
-                        traverse(v, key_parts + [k])
-                else:
-                    # All values are leaves
-                    for k, v in obj.items():
-                        conf_key = '.'.join(key_parts + [k])
-                        count += self.post_answer(conf_key, v, cursor, toml_path_str)
-            else:
-                # Leaf value
-                conf_key = '.'.join(key_parts)
-                count += self.post_answer(conf_key, obj, cursor, toml_path_str)
-
-        traverse(data, [])
-        return count
+        return self.post_answers(_walk_leaves(data), cursor, str(toml_path))
 
     def scan_directories(self, dir_list=None):
         """
         Scan a list of directories for repositories/packages.
 
         Scans directories in dir_list first, then /repos/ if it exists.
+        The filesystem pass for each directory runs in a thread pool;
+        results are written to the database serially, in the same order
+        the directories were listed, so "first answer wins" still holds.
 
         Args:
             dir_list: Optional list of directories to scan before /repos/
@@ -586,7 +996,7 @@ class RepoScanner:
         Returns:
             dict with counts: repositories, packages, qdo_functions, etc.
         """
-        cursor = self._conn.cursor()
+        cursor = self._cursor
 
         counts = {
             'repositories': 0,
@@ -597,59 +1007,173 @@ class RepoScanner:
             'installable_packages': []
         }
 
-        # Scan directories from dir_list first
+        # Directories from dir_list first
+        scan_targets = []
         if dir_list:
             for entry in dir_list:
                 repo_spec = RepoSpec.parse(entry)
                 dir_path = Path(repo_spec.path)
                 if not dir_path.exists() or not dir_path.is_dir():
                     continue
-                self._scan_single_directory(
-                    cursor, dir_path, counts,
-                    editable=repo_spec.editable
+                scan_targets.append((dir_path, repo_spec.editable))
+
+        # Then /repos/ if it exists (always non-editable). Sorted by name
+        # because the order decides which repo's answers win.
+        if self.repos_path.is_dir():
+            with os.scandir(self.repos_path) as it:
+                repo_entries = sorted(
+                    (e for e in it
+                     if e.is_dir() and not e.name.startswith('.')),
+                    key=lambda e: e.name
                 )
+            for repo_entry in repo_entries:
+                scan_targets.append((Path(repo_entry.path), False))
 
-        # Then scan /repos/ if it exists (always non-editable)
-        if self.repos_path.exists():
-            for repo_dir in sorted(self.repos_path.iterdir()):
-                if not repo_dir.is_dir():
-                    continue
-                if repo_dir.name.startswith('.'):
-                    continue
-                self._scan_single_directory(cursor, repo_dir, counts)
+        if scan_targets:
+            self._load_qdo_cache(cursor)
+            self._setup_probe_cache = {}
+            max_workers = min(SCAN_MAX_WORKERS, len(scan_targets))
+            try:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                        self._transaction():
+                    # map() yields in submission order, keeping DB writes
+                    # deterministic while later repos are still being walked.
+                    repo_scans = executor.map(
+                        lambda target: self._scan_repository(*target),
+                        scan_targets
+                    )
+                    scanned_packages = set()
+                    found_qdo = set()
+                    unreadable_paths = set()
+                    for repo_scan in repo_scans:
+                        self._store_repository(cursor, repo_scan, counts)
+                        scanned_packages.update(
+                            row[1] for row in repo_scan.package_rows)
+                        found_qdo.update(row[3] for row in repo_scan.qdo_rows)
+                        unreadable_paths.update(repo_scan.unreadable_paths)
+                    self._delete_stale_qdo(cursor, scanned_packages, found_qdo,
+                                           unreadable_paths)
+                    self._store_qdo_cache(cursor)
+                # After the commit, and only re-analyzes tables whose
+                # statistics are missing or stale, so no-op rescans stay cheap
+                cursor.execute('PRAGMA optimize')
+            finally:
+                self._question_keys = None
 
-        self._conn.commit()
         return counts
 
-    def _scan_single_directory(self, cursor, dir_path, counts, editable=False):
+    @contextmanager
+    def _transaction(self):
         """
-        Scan a single directory (may be a repo or a package).
+        Run a block of writes in one explicit transaction.
+
+        Commits on success and rolls back if the block raises, so a
+        failed scan doesn't leave a partially populated database. Inside
+        a transaction that is already open (nested use, or one started
+        by the caller) the block runs in a savepoint instead, and only
+        that savepoint is released or rolled back.
+        """
+        cursor = self._cursor
+        if self._conn.in_transaction:
+            cursor.execute('SAVEPOINT qd_transaction')
+            try:
+                yield
+            except BaseException:
+                cursor.execute('ROLLBACK TO qd_transaction')
+                cursor.execute('RELEASE qd_transaction')
+                raise
+            cursor.execute('RELEASE qd_transaction')
+            return
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _store_repository(self, cursor, repo_scan, counts):
+        """
+        Write the results of a repository scan to the database.
 
         Args:
             cursor: Database cursor
-            dir_path: Path to directory
+            repo_scan: _RepoScan returned by _scan_repository()
             counts: Dict to update with counts
-            editable: If True, packages are installed in editable mode
         """
-        dir_name = dir_path.name
-        editable_int = 1 if editable else 0
+        repo_path = repo_scan.repo_path
+        repo_name = repo_path.name
+        editable_int = 1 if repo_scan.editable else 0
 
-        # Check if already registered as repository
-        cursor.execute('SELECT name FROM repositories WHERE name = ?', (dir_name,))
-        if cursor.fetchone() is None:
-            cursor.execute(
-                'INSERT INTO repositories (name, path, editable) VALUES (?, ?, ?)',
-                (dir_name, str(dir_path), editable_int)
-            )
-            counts['repositories'] += 1
+        # Register the repository unless it already is
+        cursor.execute(
+            'INSERT OR IGNORE INTO repositories (name, path, editable) '
+            'VALUES (?, ?, ?)',
+            (repo_name, str(repo_path), editable_int)
+        )
+        counts['repositories'] += cursor.rowcount
 
-        # Scan for packages and config files
-        pkg_counts = self._scan_repository(cursor, dir_path, editable=editable)
-        counts['packages'] += pkg_counts['packages']
-        counts['qdo_functions'] += pkg_counts['qdo_functions']
-        counts['conf_answers'] += pkg_counts['conf_answers']
-        counts['conf_questions'] += pkg_counts['conf_questions']
-        counts['installable_packages'].extend(pkg_counts.get('installable_packages', []))
+        cursor.executemany(
+            '''INSERT INTO packages
+               (repo, package, path, dirname, isflask, isflaskbp, has_setup,
+                setup_path, enabled, editable)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(package) DO UPDATE SET
+                repo = excluded.repo, path = excluded.path,
+                dirname = excluded.dirname, isflask = excluded.isflask,
+                isflaskbp = excluded.isflaskbp, has_setup = excluded.has_setup,
+                setup_path = excluded.setup_path, enabled = excluded.enabled,
+                editable = excluded.editable''',
+            repo_scan.package_rows
+        )
+        counts['packages'] += len(repo_scan.package_rows)
+
+        cursor.executemany(
+            '''INSERT INTO qdo
+               (package, path, function_name, full_name, parameters, docstring)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(full_name) DO UPDATE SET
+                package = excluded.package, path = excluded.path,
+                function_name = excluded.function_name,
+                parameters = excluded.parameters,
+                docstring = excluded.docstring''',
+            repo_scan.qdo_rows
+        )
+        counts['qdo_functions'] += len(repo_scan.qdo_rows)
+        counts['installable_packages'].extend(repo_scan.installable_packages)
+
+        for toml_path, data in repo_scan.conf_tomls:
+            qa_counts = self._process_qd_conf_toml(cursor, toml_path, data)
+            counts['conf_answers'] += qa_counts['answers']
+            counts['conf_questions'] += qa_counts['questions']
+
+    def _delete_stale_qdo(self, cursor, scanned_packages, found_qdo,
+                          unreadable_paths=()):
+        """
+        Delete qdo rows of scanned packages that this scan didn't find.
+
+        Rows are upserted rather than rebuilt, so functions removed from
+        a package since the last scan have to be swept out explicitly.
+        Packages outside this scan are left alone, and so are rows from
+        files that couldn't be read this time (a transient failure must
+        not drop their functions).
+
+        Args:
+            cursor: Database cursor
+            scanned_packages: Set of package names scanned
+            found_qdo: Set of qdo full_names found in them
+            unreadable_paths: Set of .py paths that couldn't be read
+
+        Returns:
+            Count of rows deleted
+        """
+        cursor.execute('SELECT package, path, full_name FROM qdo')
+        stale = [(full_name,) for package, path, full_name in cursor
+                 if package in scanned_packages and full_name not in found_qdo
+                 and path not in unreadable_paths]
+        if stale:
+            cursor.executemany('DELETE FROM qdo WHERE full_name = ?', stale)
+        return len(stale)
 
     def scan_repos(self):
         """
@@ -665,102 +1189,114 @@ class RepoScanner:
         """
         return self.scan_directories()
 
-    def _scan_repository(self, cursor, repo_path, editable=False):
+    def _scan_repository(self, repo_path, editable=False):
         """
         Scan a single repository for packages.
 
+        Only touches the filesystem, so it is safe to run in a worker
+        thread. Database writes are done by _store_repository().
+
         Args:
-            cursor: Database cursor
             repo_path: Path to the repository
             editable: If True, packages are installed in editable mode
 
         Returns:
-            dict with counts: packages, qdo_functions, conf_answers, conf_questions
+            _RepoScan with package rows, qdo rows and parsed qd_conf.toml data
         """
-        counts = {
-            'packages': 0,
-            'qdo_functions': 0,
-            'conf_answers': 0,
-            'conf_questions': 0,
-            'installable_packages': []
-        }
+        repo_scan = _RepoScan(repo_path, editable)
         repo_name = repo_path.name
 
-        # Walk directory tree and find any directory with __init__.py
-        for dirpath, dirnames, filenames in os.walk(repo_path):
-            # Skip hidden directories and common non-package directories
-            dirnames[:] = [
-                d for d in dirnames
-                if not d.startswith('.')
-                and not d.startswith('_')
-                and d not in ('build', 'dist', 'node_modules', '.git')
-                and not (Path(dirpath) / d / 'pyvenv.cfg').exists()
-            ]
-
-            dir_path = Path(dirpath)
-
-            if '__init__.py' in filenames:
-                package_name = dir_path.name
+        # Walk directory tree and find any directory with __init__.py.
+        # Paths stay str throughout the walk.
+        for dirpath, filenames_set in _walk_repo_dirs(str(repo_path)):
+            if '__init__.py' in filenames_set:
+                package_name = os.path.basename(dirpath)
                 setup_path = self._add_package(
-                    cursor, repo_name, package_name, dir_path, counts,
+                    repo_scan, repo_name, package_name, dirpath,
                     editable=editable
                 )
                 if setup_path:
-                    counts['installable_packages'].append({
+                    repo_scan.installable_packages.append({
                         'name': package_name,
-                        'path': str(setup_path),
+                        'path': setup_path,
                         'repo': repo_name,
                         'editable': 1 if editable else 0
                     })
 
             # Check for qd_conf.toml
-            if 'qd_conf.toml' in filenames:
-                toml_path = dir_path / 'qd_conf.toml'
-                qa_counts = self._scan_qd_conf_toml(cursor, toml_path)
-                counts['conf_answers'] += qa_counts['answers']
-                counts['conf_questions'] += qa_counts['questions']
+            if 'qd_conf.toml' in filenames_set:
+                toml_path = os.path.join(dirpath, 'qd_conf.toml')
+                data = self._read_qd_conf_toml(toml_path)
+                if data:
+                    repo_scan.conf_tomls.append((toml_path, data))
 
-        return counts
+        return repo_scan
 
-    def _scan_qd_conf_toml(self, cursor, toml_path):
+    def _read_qd_conf_toml(self, toml_path):
         """
-        Scan a qd_conf.toml file with "questions" and "answers" sections.
+        Read a qd_conf.toml file.
+
+        Parsed files are kept for the life of the scanner and reused on
+        later scans while the file's mtime and size are unchanged.
 
         Args:
-            cursor: Database cursor
-            toml_path: Path to the TOML file
+            toml_path: str (or Path) path to the TOML file
 
         Returns:
-            dict with counts: answers, questions
+            Parsed dict, or None if the file can't be read or is empty
         """
-        counts = {'answers': 0, 'questions': 0}
+        path_str = str(toml_path)
+        try:
+            st = os.stat(path_str)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._conf_toml_cache.get(path_str)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
 
         try:
-            with open(toml_path, 'rb') as f:
-                data = tomllib.load(f)
+            data = _read_toml(path_str)
         except Exception:
-            return counts
+            return None
 
         if not data or not isinstance(data, dict):
-            return counts
+            data = None
+        self._conf_toml_cache[path_str] = (stamp, data)
+        return data
+
+    def _process_qd_conf_toml(self, cursor, toml_path, data):
+        """
+        Process a qd_conf.toml file with "questions" and "answers" sections.
+
+        Args:
+            cursor: Database cursor
+            toml_path: str (or Path) path to the TOML file
+            data: Parsed TOML dict from _read_qd_conf_toml()
+
+        Returns:
+            dict with counts: answers, questions
+        """
+        counts = {'answers': 0, 'questions': 0}
+        toml_path_str = os.fspath(toml_path)
 
         # Process "answers" section if present
         if 'answers' in data and isinstance(data['answers'], dict):
             counts['answers'] = self._process_answers_section(
-                cursor, data['answers'], str(toml_path)
+                cursor, data['answers'], toml_path_str
             )
 
         # Process "questions" section if present
         if 'questions' in data and isinstance(data['questions'], dict):
             counts['questions'] = self._process_questions_section(
-                cursor, data['questions'], str(toml_path)
+                cursor, data['questions'], toml_path_str
             )
 
         # Process "flask" section if present
         if 'flask' in data and isinstance(data['flask'], dict):
-            package_name = Path(toml_path).parent.name
+            package_name = os.path.basename(os.path.dirname(toml_path_str))
             flask_counts = self._process_flask_section(
-                cursor, data['flask'], package_name, str(toml_path)
+                cursor, data['flask'], package_name, toml_path_str
             )
             counts['flask_init'] = flask_counts.get('init_functions', 0)
 
@@ -858,20 +1394,10 @@ class RepoScanner:
         Returns:
             Count of answers added
         """
-        count = 0
-
-        def traverse(obj, key_parts):
-            nonlocal count
-            if isinstance(obj, dict):
-                for k, v in obj.items():
-                    traverse(v, key_parts + [k])
-            else:
-                # Leaf value - insert into database (first answer wins)
-                conf_key = '.'.join(key_parts)
-                count += self.post_answer(conf_key, obj, cursor, yaml_path_str)
-
-        traverse(answers_data, [])
-        return count
+        # First answer wins
+        return self.post_answers(
+            _walk_leaves(answers_data), cursor, yaml_path_str
+        )
 
     def _process_questions_section(self, cursor, questions_data, yaml_path_str):
         """
@@ -885,49 +1411,44 @@ class RepoScanner:
         Returns:
             Count of questions added
         """
-        count = 0
-
-        def is_question_leaf(obj):
-            """Check if this dict is a question definition (has help or conf_type)."""
-            if not isinstance(obj, dict):
-                return False
-            return 'help' in obj or 'conf_type' in obj
-
-        def traverse(obj, key_parts):
-            nonlocal count
-            if is_question_leaf(obj):
-                conf_key = '.'.join(key_parts)
-                question = ConfQuestion.from_toml(
-                    conf_key, obj, yaml_path=yaml_path_str
-                )
-                question.select_by_key(cursor)
-                if cursor.fetchone() is None:
-                    question.insert(cursor)
-                    count += 1
-            elif isinstance(obj, dict):
-                for k, v in obj.items():
-                    traverse(v, key_parts + [k])
-
-        traverse(questions_data, [])
-        return count
+        if self._question_keys is None:
+            cursor.execute('SELECT conf_key FROM conf_questions')
+            self._question_keys = {row[0] for row in cursor}
+
+        # Existing conf_keys are kept (first question wins)
+        questions = []
+        for conf_key, obj in _walk_leaves(questions_data, _is_question_leaf):
+            # Non-dict values outside a question definition are ignored
+            if not isinstance(obj, dict) or conf_key in self._question_keys:
+                continue
+            self._question_keys.add(conf_key)
+            questions.append(
+                ConfQuestion.from_toml(conf_key, obj, yaml_path=yaml_path_str)
+            )
+        ConfQuestion.insert_many(cursor, questions)
+        return len(questions)
 
-    def _add_package(self, cursor, repo_name, package_name, package_path, counts,
+    def _add_package(self, repo_scan, repo_name, package_name, package_path,
                      editable=False):
         """
-        Add a package to the database.
+        Add a package to a repository scan.
 
         Args:
-            cursor: Database cursor
+            repo_scan: _RepoScan collecting rows for the repository
             repo_name: Name of the repository
             package_name: Name of the package
-            package_path: Path to the package directory
-            counts: Dict to update with counts
+            package_path: str (or Path) path to the package directory
             editable: If True, package should be installed in editable mode
 
         Returns:
-            Path to setup.py directory if installable, None otherwise
+            str path to setup.py directory if installable, None otherwise
         """
-        isflask, isflaskbp = self._detect_flask_package(package_path)
+        package_path = os.fspath(package_path)
+
+        # Scan for qdo_* functions; the same file pass detects Flask
+        flask_flags = self._scan_package_for_qdo(
+            repo_scan, package_name, package_path
+        )
 
         # Check for setup.py or pyproject.toml in package, parent, or
         # grandparent directory.
@@ -935,165 +1456,203 @@ class RepoScanner:
         # src/ layout:  repo/src/package/__init__.py + repo/setup.py (grandparent)
         has_setup = False
         setup_path = None
-        parent_path = package_path.parent
-        grandparent_path = parent_path.parent
+        parent_path = os.path.dirname(package_path)
+        grandparent_path = os.path.dirname(parent_path)
         for candidate in (parent_path, grandparent_path, package_path):
-            if ((candidate / 'setup.py').exists()
-                    or (candidate / 'pyproject.toml').exists()):
+            if self._find_setup(candidate):
                 has_setup = True
                 setup_path = candidate
                 break
 
         editable_int = 1 if editable else 0
-        setup_path_str = str(setup_path) if setup_path else None
-        cursor.execute(
-            '''INSERT OR REPLACE INTO packages
-               (repo, package, path, dirname, isflask, isflaskbp, has_setup,
-                setup_path, enabled, editable)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (repo_name, package_name, str(package_path), package_path.name,
-             1 if isflask else 0, 1 if isflaskbp else 0, 1 if has_setup else 0,
-             setup_path_str, 1, editable_int)
+        repo_scan.package_rows.append(
+            (repo_name, package_name, package_path,
+             os.path.basename(package_path),
+             1 if flask_flags & _FLASK_APP else 0,
+             1 if flask_flags & _FLASK_BLUEPRINT else 0,
+             1 if has_setup else 0, setup_path, 1, editable_int)
         )
-        counts['packages'] += 1
-
-        # Scan for qdo_* functions
-        qdo_count = self._scan_package_for_qdo(cursor, package_name, package_path)
-        counts['qdo_functions'] += qdo_count
 
         return setup_path
 
-    def _detect_flask_package(self, package_path):
+    def _find_setup(self, candidate):
         """
-        Detect if a package is a Flask app or blueprint.
+        Check whether a directory holds setup.py or pyproject.toml.
+
+        Sibling packages share parent/grandparent directories, so results
+        are memoized for the duration of a scan.
 
         Args:
-            package_path: Path to the package directory
+            candidate: str path to the directory
 
         Returns:
-            tuple: (isflask, isflaskbp)
+            True if the directory is a setup directory
         """
-        isflask = False
-        isflaskbp = False
-
-        # Check __init__.py and common files for Flask indicators
-        files_to_check = ['__init__.py', 'app.py', 'routes.py', 'views.py']
-
-        for filename in files_to_check:
-            filepath = package_path / filename
-            if not filepath.exists():
-                continue
-
-            try:
-                content = filepath.read_text()
-                if 'Flask(' in content or 'flask.Flask' in content:
-                    isflask = True
-                if 'Blueprint(' in content or 'flask.Blueprint' in content:
-                    isflaskbp = True
-            except Exception:
-                continue
-
-        return isflask, isflaskbp
-
-    def _scan_package_for_qdo(self, cursor, package_name, package_path):
+        found = self._setup_probe_cache.get(candidate)
+        if found is None:
+            found = any(os.path.exists(os.path.join(candidate, name))
+                        for name in _SETUP_MARKERS)
+            self._setup_probe_cache[candidate] = found
+        return found
+
+    def _scan_package_for_qdo(self, repo_scan, package_name, package_path):
         """
-        Scan a package for qdo_* functions.
+        Scan a package for qdo_* functions and Flask app/blueprint markers.
+
+        Each .py file is probed once for both: the package's top-level
+        _FLASK_FILES get their Flask markers checked by the same read
+        (or cache hit) that serves qdo extraction. Cache misses are
+        parsed in this thread.
 
         Args:
-            cursor: Database cursor
+            repo_scan: _RepoScan collecting rows for the repository
             package_name: Name of the package
-            package_path: Path to the package directory
+            package_path: str (or Path) path to the package directory
 
         Returns:
-            Count of qdo functions found
+            _FLASK_APP/_FLASK_BLUEPRINT bits found in the package
         """
-        count = 0
+        package_path = os.fspath(package_path)
+        # Paths from _scandir_py() start with this; what follows is the
+        # name relative to the package
+        rel_start = len(os.path.join(package_path, ''))
+        package_flask_flags = 0
+        rows = []
 
         # Scan all .py files in the package
-        for py_file in package_path.rglob('*.py'):
-            try:
-                functions = self._extract_qdo_functions(py_file)
-                for func_info in functions:
-                    full_name = f"{package_name}.{func_info['name']}"
-                    cursor.execute(
-                        '''INSERT OR REPLACE INTO qdo
-                           (package, path, function_name, full_name, parameters, docstring)
-                           VALUES (?, ?, ?, ?, ?, ?)''',
-                        (package_name, str(py_file), func_info['name'],
-                         full_name, func_info['parameters'], func_info['docstring'])
-                    )
-                    count += 1
-            except Exception:
-                # Skip files that can't be parsed
+        for py_path in _scandir_py(package_path):
+            flask = py_path[rel_start:] in _FLASK_FILES
+            functions, flask_flags, miss = self._probe_qdo_file(py_path,
+                                                                flask)
+            if flask:
+                package_flask_flags |= flask_flags or 0
+            if functions is None and miss is None:
+                repo_scan.unreadable_paths.append(py_path)
                 continue
+            if miss is not None:
+                source, digest, stat_key = miss
+                functions = _parse_qdo_functions(source)
+                self._set_cached_qdo_functions(py_path, digest, functions,
+                                               stat_key, flask_flags)
+            for func_info in functions:
+                full_name = f"{package_name}.{func_info['name']}"
+                rows.append(
+                    (package_name, py_path, func_info['name'],
+                     full_name, func_info['parameters'], func_info['docstring'])
+                )
 
-        return count
+        # Stored with a single executemany per repository
+        repo_scan.qdo_rows.extend(rows)
+        return package_flask_flags
 
-    def _extract_qdo_functions(self, filepath):
+    def _probe_qdo_file(self, filepath, flask=False):
         """
-        Extract qdo_* functions from a Python file using AST.
+        Look a .py file up in the qdo_cache.
+
+        A file whose mtime and size match the cached stat_key is a hit
+        without being read, provided its Flask markers are cached when
+        flask is set. Otherwise it is read: files with no qdo_* def, and
+        files whose content hash still matches, are hits too and get
+        their cache entry refreshed.
 
         Args:
-            filepath: Path to the Python file
+            filepath: str path to the Python file
+            flask: If True, also check the file for Flask markers
 
         Returns:
-            List of dicts with function info
+            tuple: (functions, flask_flags, miss). On a hit miss is None;
+            when the source has to be parsed functions is None and miss
+            is (source, digest, stat_key); if the file can't be read both
+            are None. flask_flags is a _flask_flags() result, or None if
+            flask wasn't set and nothing is cached.
         """
-        functions = []
-
+        self._qdo_cache_seen.add(filepath)
         try:
-            source = filepath.read_text()
-            tree = ast.parse(source)
-        except Exception:
-            return functions
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                if node.name.startswith('qdo_'):
-                    func_info = {
-                        'name': node.name,
-                        'parameters': self._get_function_parameters(node),
-                        'docstring': ast.get_docstring(node) or ''
-                    }
-                    functions.append(func_info)
-
-        return functions
+            stat_key = _qdo_stat_key(os.stat(filepath))
+        except OSError:
+            return None, None, None
+        cached = self._qdo_cache.get(filepath)
+        if (cached is not None and cached[2] == stat_key
+                and (cached[3] is not None or not flask)):
+            return json.loads(cached[1]), cached[3], None
+
+        # Stat before read: a write in between leaves a stale stat_key,
+        # which only costs a re-read next time.
+        try:
+            with open(filepath, 'rb') as f:
+                source = f.read()
+        except OSError:
+            return None, None, None
+
+        flask_flags = _flask_flags(source) if flask else None
+        if not _may_define_qdo(source):
+            # Empty digest: never equal to a real one, so adding a qdo_*
+            # def later is a miss
+            digest = b''
+            functions = []
+        else:
+            digest = _qdo_cache_digest(source)
+            if cached is None or cached[0] != digest:
+                return None, flask_flags, (source, digest, stat_key)
+            functions = json.loads(cached[1])
+        self._set_cached_qdo_functions(filepath, digest, functions, stat_key,
+                                       flask_flags)
+        return functions, flask_flags, None
+
+    def _set_cached_qdo_functions(self, filepath, digest, functions,
+                                  stat_key, flask_flags=None):
+        """Record a cache entry for _store_qdo_cache()."""
+        self._qdo_cache[filepath] = (digest, json.dumps(functions), stat_key,
+                                     flask_flags)
+        self._qdo_cache_dirty.add(filepath)
+
+    def _load_qdo_cache(self, cursor):
+        """Load the qdo_cache table into memory before a scan."""
+        cursor.execute(
+            'SELECT path, sha256, qdo_json, stat_key, flask_flags '
+            'FROM qdo_cache'
+        )
+        self._qdo_cache = {row[0]: row[1:] for row in cursor}
+        self._qdo_cache_dirty = set()
+        self._qdo_cache_seen = set()
 
-    def _get_function_parameters(self, func_node):
+    def _store_qdo_cache(self, cursor):
         """
-        Extract parameter information from a function AST node.
-
-        Args:
-            func_node: AST FunctionDef node
+        Write qdo_cache entries added or changed during a scan, and
+        delete entries for files that no longer exist.
 
-        Returns:
-            String describing the parameters
+        Only entries the scan didn't visit are checked for existence, so
+        files in repositories outside this scan keep their entries.
         """
-        params = []
-        args = func_node.args
-
-        # Regular arguments
-        for i, arg in enumerate(args.args):
-            param_str = arg.arg
-            # Check for default value
-            default_index = i - (len(args.args) - len(args.defaults))
-            if default_index >= 0 and default_index < len(args.defaults):
-                default = args.defaults[default_index]
-                try:
-                    param_str += f"={ast.literal_eval(default)!r}"
-                except Exception:
-                    param_str += "=..."
-            params.append(param_str)
-
-        # *args
-        if args.vararg:
-            params.append(f"*{args.vararg.arg}")
-
-        # **kwargs
-        if args.kwarg:
-            params.append(f"**{args.kwarg.arg}")
+        cursor.executemany(
+            'INSERT OR REPLACE INTO qdo_cache '
+            '(path, sha256, qdo_json, stat_key, flask_flags) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(path,) + self._qdo_cache[path]
+             for path in self._qdo_cache_dirty]
+        )
+        self._qdo_cache_dirty = set()
+
+        seen = self._qdo_cache_seen
+        gone = [path for path in self._qdo_cache
+                if path not in seen and not os.path.exists(path)]
+        if gone:
+            cursor.executemany('DELETE FROM qdo_cache WHERE path = ?',
+                               [(path,) for path in gone])
+            for path in gone:
+                del self._qdo_cache[path]
+        self._qdo_cache_seen = set()
+
+    def _row_cursor(self):
+        """
+        New cursor returning sqlite3.Row objects.
 
-        return ', '.join(params)
+        The row factory is set on the cursor, not the connection, so the
+        shared tuple cursor and concurrent getters are unaffected.
+        """
+        cursor = self._conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        return cursor
 
     def get_answers(self):
         """
@@ -1102,14 +1661,10 @@ class RepoScanner:
         Returns:
             Dict mapping conf_key to conf_value
         """
-        cursor = self._conn.cursor()
-        answers = {}
-
+        cursor = self._cursor
         cursor.execute('SELECT conf_key, conf_value FROM conf_answers')
-        for row in cursor.fetchall():
-            answers[row[0]] = row[1]
-
-        return answers
+        # Rows are (conf_key, conf_value) tuples
+        return dict(cursor)
 
     def get_questions(self):
         """
@@ -1118,8 +1673,7 @@ class RepoScanner:
         Returns:
             List of ConfQuestion objects
         """
-        self._conn.row_factory = sqlite3.Row
-        cursor = self._conn.cursor()
+        cursor = self._row_cursor()
 
         cursor.execute('''
             SELECT conf_key, conf_help, conf_type, yaml_path
@@ -1127,8 +1681,7 @@ class RepoScanner:
             ORDER BY conf_key
         ''')
 
-        questions = [ConfQuestion.from_row(row) for row in cursor.fetchall()]
-        self._conn.row_factory = None
+        questions = [ConfQuestion.from_row(row) for row in cursor]
         return questions
 
     def get_installable_packages(self):
@@ -1138,8 +1691,7 @@ class RepoScanner:
         Returns:
             List of dicts with package, setup_path, repo, enabled, editable
         """
-        self._conn.row_factory = sqlite3.Row
-        cursor = self._conn.cursor()
+        cursor = self._row_cursor()
 
         cursor.execute('''
             SELECT package, setup_path, repo, enabled, editable
@@ -1148,8 +1700,7 @@ class RepoScanner:
             ORDER BY package
         ''')
 
-        packages = [dict(row) for row in cursor.fetchall()]
-        self._conn.row_factory = None
+        packages = [dict(row) for row in cursor]
         return packages
 
     def get_flask_init_sequence(self):
@@ -1166,8 +1717,7 @@ class RepoScanner:
         if self._conn is None:
             return []
 
-        self._conn.row_factory = sqlite3.Row
-        cursor = self._conn.cursor()
+        cursor = self._row_cursor()
 
         cursor.execute('''
             SELECT fi.module, fi.function, fi.priority, fi.params_json,
@@ -1179,7 +1729,7 @@ class RepoScanner:
         ''')
 
         results = []
-        for row in cursor.fetchall():
+        for row in cursor:
             entry = dict(row)
             # Parse params_json back to dict
             if entry['params_json']:
@@ -1189,7 +1739,6 @@ class RepoScanner:
             del entry['params_json']
             results.append(entry)
 
-        self._conn.row_factory = None
         return results
 
     def set_package_enabled(self, package_name, enabled):
@@ -1200,7 +1749,7 @@ class RepoScanner:
             package_name: Name of the package
             enabled: Boolean or truthy value
         """
-        cursor = self._conn.cursor()
+        cursor = self._cursor
         cursor.execute(
             'UPDATE packages SET enabled = ? WHERE package = ?',
             (1 if enabled else 0, package_name)
@@ -1222,6 +1771,126 @@ def scan_repos(site_root):
     return scanner.scan_repos()
 
 
+class _RepoDbReader:
+    """
+    Shared read-only connection to one repos.db, with query results
+    cached until another connection commits a change.
+
+    file_id is the (st_dev, st_ino) of the file the connection opened;
+    a repos.db deleted and rebuilt, or replaced, gets a new reader.
+    """
+    __slots__ = ('conn', 'file_id', 'lock', 'data_version', 'functions',
+                 'by_name')
+
+    def __init__(self, conn, file_id):
+        self.conn = conn
+        self.file_id = file_id
+        self.lock = threading.Lock()
+        self.data_version = None
+        self.functions = None
+        # function_name -> row dict; found functions only, so it is bounded
+        # by the size of the qdo table
+        self.by_name = {}
+
+    def check_version(self):
+        """
+        Drop cached results if the database changed since the last call.
+
+        PRAGMA data_version changes whenever another connection commits,
+        including a RepoScanner in this process. Call with lock held.
+        """
+        data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self.data_version:
+            self.data_version = data_version
+            self.functions = None
+            self.by_name = {}
+
+    def close(self):
+        """Close the connection once no lookup is using it."""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+# Most readers kept open by _get_repos_db_reader(); the least recently
+# used one is closed beyond this
+REPOS_DB_READERS_MAX = 8
+
+# Resolved repos.db path str -> _RepoDbReader, least recently used first.
+# A reader whose file_id no longer matches the file on disk is replaced.
+_repos_db_readers = {}
+_repos_db_readers_lock = threading.Lock()
+
+
+def _get_repos_db_reader(db_path, file_id):
+    """
+    Return the shared reader for a repos.db file, opening it if needed.
+
+    Readers are shared by get_qdo_functions()/get_qdo_function() across
+    calls and threads. Queries on one are serialized by its lock, so
+    lookups for different sites don't contend.
+
+    Args:
+        db_path: Path to an existing repos.db
+        file_id: (st_dev, st_ino) of db_path, from os.stat()
+
+    Returns:
+        _RepoDbReader
+    """
+    db_path_str = os.path.realpath(db_path)
+    evicted = []
+    with _repos_db_readers_lock:
+        reader = _repos_db_readers.pop(db_path_str, None)
+        if reader is not None and reader.file_id != file_id:
+            # The connection still reads the old, unlinked file
+            evicted.append(reader)
+            reader = None
+        if reader is None:
+            db_uri = Path(db_path_str).as_uri() + '?mode=ro'
+            conn = sqlite3.connect(db_uri, uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            reader = _RepoDbReader(conn, file_id)
+        # Re-inserted, so the dict stays in least recently used order
+        _repos_db_readers[db_path_str] = reader
+        while len(_repos_db_readers) > REPOS_DB_READERS_MAX:
+            oldest = next(iter(_repos_db_readers))
+            evicted.append(_repos_db_readers.pop(oldest))
+    for old_reader in evicted:
+        old_reader.close()
+    return reader
+
+
+@contextmanager
+def _repos_db_reader(site_root):
+    """
+    Hold the locked, up-to-date reader for a site's repos.db.
+
+    Yields:
+        _RepoDbReader, or None if the site has no repos.db
+    """
+    db_path = os.path.join(site_root, 'conf', 'repos.db')
+    while True:
+        try:
+            st = os.stat(db_path)
+        except OSError:
+            # Don't keep a deleted repos.db open
+            with _repos_db_readers_lock:
+                reader = _repos_db_readers.pop(os.path.realpath(db_path),
+                                               None)
+            if reader is not None:
+                reader.close()
+            yield None
+            return
+        reader = _get_repos_db_reader(db_path, (st.st_dev, st.st_ino))
+        with reader.lock:
+            # Another thread may have evicted and closed it meanwhile
+            if reader.conn is not None:
+                reader.check_version()
+                yield reader
+                return
+
+
 def get_qdo_functions(site_root):
     """
     Get all qdo_* functions from the database.
@@ -1232,23 +1901,20 @@ def get_qdo_functions(site_root):
     Returns:
         List of dicts with function information
     """
-    db_path = Path(site_root) / 'conf' / 'repos.db'
-    if not db_path.exists():
-        return []
-
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        SELECT package, path, function_name, full_name, parameters, docstring
-        FROM qdo ORDER BY function_name
-    ''')
-
-    functions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with _repos_db_reader(site_root) as reader:
+        if reader is None:
+            return []
+        if reader.functions is None:
+            cursor = reader.conn.execute('''
+                SELECT package, path, function_name, full_name, parameters,
+                       docstring
+                FROM qdo ORDER BY function_name
+            ''')
+            reader.functions = [dict(row) for row in cursor]
+        functions = reader.functions
 
-    return functions
+    # Copies, so callers can't alter the cached rows
+    return [dict(function) for function in functions]
 
 
 def get_qdo_function(site_root, function_name):
@@ -1265,20 +1931,21 @@ def get_qdo_function(site_root, function_name):
     if not function_name.startswith('qdo_'):
         function_name = f'qdo_{function_name}'
 
-    db_path = Path(site_root) / 'conf' / 'repos.db'
-    if not db_path.exists():
-        return None
-
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        SELECT package, path, function_name, full_name, parameters, docstring
-        FROM qdo WHERE function_name = ?
-    ''', (function_name,))
-
-    row = cursor.fetchone()
-    conn.close()
-
-    return dict(row) if row else None
+    with _repos_db_reader(site_root) as reader:
+        if reader is None:
+            return None
+        function = reader.by_name.get(function_name)
+        if function is None:
+            cursor = reader.conn.execute('''
+                SELECT package, path, function_name, full_name, parameters,
+                       docstring
+                FROM qdo WHERE function_name = ?
+            ''', (function_name,))
+            row = cursor.fetchone()
+            if row is None:
+                # Misses aren't cached: arbitrary names would grow by_name
+                # without bound
+                return None
+            function = reader.by_name[function_name] = dict(row)
+
+    return dict(function)
@@ -67,12 +67,14 @@ def _write_file(filepath, content, result):
         result.errors.append(f"Failed to write {filepath}: {e}")
 
 
-def _make_dirs(dir_list, result):
-    """Create directories and track them in result."""
-    for name, path in dir_list:
+def _make_dirs_batch(paths, result):
+    """Create each unique directory once, parents first, and track them."""
+    for path in sorted(set(paths), key=lambda p: (len(p), p)):
         try:
-            os.makedirs(path, exist_ok=True)
+            os.mkdir(path)
             result.dirs_created.append(path)
+        except FileExistsError:
+            pass
         except OSError as e:
             result.errors.append(f"Failed to create directory {path}: {e}")
 
@@ -483,14 +485,24 @@ def create_package(
         result.errors.append(f"'{dpath}' is not an existing directory")
         return result
 
+    # Creating the package root doubles as the existence check
     pkg_root = os.path.join(dpath, package_name)
-    if os.path.exists(pkg_root):
+    try:
+        os.mkdir(pkg_root)
+    except FileExistsError:
         result.errors.append(
             f"'{pkg_root}' already exists; will not overwrite")
         return result
-
+    except OSError as e:
+        result.errors.append(f"Failed to create directory {pkg_root}: {e}")
+    else:
+        result.dirs_created.append(pkg_root)
     result.package_path = pkg_root
 
+    if result.errors:
+        result.success = False
+        return result
+
     # --- Derive names ---
     short_name = _derive_short_name(package_name)
     display_name = _derive_display_name(short_name)
@@ -507,61 +519,76 @@ def create_package(
     if include_cli is None:
         include_cli = is_flask
 
-    # --- Create directories ---
     src_pkg = os.path.join(pkg_root, "src", package_name)
 
-    dirs = [
-        ("package root", pkg_root),
-        ("src", os.path.join(pkg_root, "src")),
-        ("src package", src_pkg),
+    # --- Generate file contents ---
+    files = [
+        (os.path.join(pkg_root, "setup.py"),
+         _gen_setup_py(package_name, version, description, author,
+                       author_email, is_flask, flask_dependencies,
+                       install_requires)),
+        (os.path.join(pkg_root, "README.md"),
+         _gen_readme(package_name, short_name, display_name, description,
+                     is_flask, init_function_name)),
     ]
 
     if is_flask:
-        dirs.extend([
-            ("conf", os.path.join(src_pkg, "conf")),
-            ("templates", os.path.join(src_pkg, "templates")),
-            ("templates pkg", os.path.join(src_pkg, "templates", package_name)),
-            ("static", os.path.join(src_pkg, "static")),
+        init_content = _gen_init_py_flask(
+            package_name, short_name, display_name, version,
+            init_function_name, blueprint_name, url_prefix)
+    else:
+        init_content = _gen_init_py_library(package_name, version,
+                                            description)
+    files.append((os.path.join(src_pkg, "__init__.py"), init_content))
+
+    if is_flask:
+        files.extend([
+            (os.path.join(src_pkg, "routes.py"),
+             _gen_routes_py(package_name, short_name, blueprint_name)),
+            (os.path.join(src_pkg, "models.py"),
+             _gen_models_py(package_name, short_name)),
+            # .gitkeep files
+            (os.path.join(src_pkg, "templates", package_name, ".gitkeep"),
+             ""),
+            (os.path.join(src_pkg, "static", ".gitkeep"), ""),
+            # conf/<name>.yaml.example
+            (os.path.join(src_pkg, "conf", f"{package_name}.yaml.example"),
+             _gen_yaml_example(package_name, short_name, display_name)),
         ])
 
-    _make_dirs(dirs, result)
+    if include_cli:
+        files.append((os.path.join(src_pkg, "cli.py"),
+                      _gen_cli_py(package_name, short_name)))
+
+    if include_check_module:
+        files.append((os.path.join(src_pkg, f"check_{short_name}.py"),
+                      _gen_check_module(package_name, short_name,
+                                        display_name, checker_class_name)))
+
+    qd_conf_path = os.path.join(src_pkg, "qd_conf.toml")
+
+    # --- Create directories ---
+    # Every directory is the parent of some file (or of such a directory),
+    # so collect them once and mkdir each without a prior exists() probe.
+    dirs = set()
+    for path in [qd_conf_path] + [path for path, _ in files]:
+        parent = os.path.dirname(path)
+        while parent != pkg_root and parent not in dirs:
+            dirs.add(parent)
+            parent = os.path.dirname(parent)
+
+    _make_dirs_batch(dirs, result)
 
     # Bail early if directory creation had errors
     if result.errors:
         result.success = False
         return result
 
-    # --- Generate files ---
-
-    # setup.py
-    _write_file(
-        os.path.join(pkg_root, "setup.py"),
-        _gen_setup_py(package_name, version, description, author,
-                      author_email, is_flask, flask_dependencies,
-                      install_requires),
-        result,
-    )
-
-    # README.md
-    _write_file(
-        os.path.join(pkg_root, "README.md"),
-        _gen_readme(package_name, short_name, display_name, description,
-                    is_flask, init_function_name),
-        result,
-    )
-
-    # __init__.py
-    if is_flask:
-        init_content = _gen_init_py_flask(
-            package_name, short_name, display_name, version,
-            init_function_name, blueprint_name, url_prefix)
-    else:
-        init_content = _gen_init_py_library(package_name, version,
-                                            description)
-    _write_file(os.path.join(src_pkg, "__init__.py"), init_content, result)
+    # --- Write files ---
+    for path, content in files:
+        _write_file(path, content, result)
 
     # qd_conf.toml (via qdos.write_toml)
-    qd_conf_path = os.path.join(src_pkg, "qd_conf.toml")
     try:
         conf_data = _gen_qd_conf_data(
             package_name, short_name, is_flask,
@@ -571,49 +598,6 @@ def create_package(
     except OSError as e:
         result.errors.append(f"Failed to write {qd_conf_path}: {e}")
 
-    # Flask-specific files
-    if is_flask:
-        _write_file(
-            os.path.join(src_pkg, "routes.py"),
-            _gen_routes_py(package_name, short_name, blueprint_name),
-            result,
-        )
-        _write_file(
-            os.path.join(src_pkg, "models.py"),
-            _gen_models_py(package_name, short_name),
-            result,
-        )
-
-        # .gitkeep files
-        _write_file(
-            os.path.join(src_pkg, "templates", package_name, ".gitkeep"),
-            "", result)
-        _write_file(
-            os.path.join(src_pkg, "static", ".gitkeep"),
-            "", result)
-
-        # conf/<name>.yaml.example
-        _write_file(
-            os.path.join(src_pkg, "conf", f"{package_name}.yaml.example"),
-            _gen_yaml_example(package_name, short_name, display_name),
-            result,
-        )
-
-    if include_cli:
-        _write_file(
-            os.path.join(src_pkg, "cli.py"),
-            _gen_cli_py(package_name, short_name),
-            result,
-        )
-
-    if include_check_module:
-        _write_file(
-            os.path.join(src_pkg, f"check_{short_name}.py"),
-            _gen_check_module(package_name, short_name, display_name,
-                              checker_class_name),
-            result,
-        )
-
     # --- Final status ---
     result.success = len(result.errors) == 0
     return result
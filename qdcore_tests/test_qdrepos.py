@@ -4,8 +4,11 @@ Tests for qdcore.qdrepos - RepoSpec parsing and editable flag round-trip.
 
 import os
 import tempfile
+import threading
 
-from qdcore.qdrepos import RepoSpec, RepoScanner, EDITABLE_PREFIX
+from qdcore import qdrepos
+from qdcore.qdrepos import (ConfAnswer, RepoSpec, RepoScanner, EDITABLE_PREFIX,
+                            get_qdo_function, get_qdo_functions)
 
 
 class TestRepoSpecParse:
@@ -44,6 +47,18 @@ class TestRepoSpecParse:
         assert repr(spec) == "RepoSpec('e::/tmp/foo')"
 
 
+class TestConfAnswerIsDisabled:
+    """Tests for ConfAnswer.is_disabled."""
+
+    def test_disabled_strings(self):
+        for value in ('false', 'No', '0', 'N', False):
+            assert ConfAnswer('a.enabled', value).is_disabled is True
+
+    def test_enabled_values(self):
+        for value in ('true', 'yes', '/srv/no', 'nonsense', True, None, 0):
+            assert ConfAnswer('a.enabled', value).is_disabled is False
+
+
 class TestEditableRoundTrip:
     """Test that editable flag survives scan → DB → retrieve."""
 
@@ -118,3 +133,665 @@ class TestEditableRoundTrip:
         assert mypkg[0]['setup_path'] == str(repo_dir)
 
         scanner.close()
+
+
+class TestConnect:
+    """Tests for RepoScanner.connect() schema setup."""
+
+    def test_schema_created_once(self, tmp_path, monkeypatch):
+        """A stamped repos.db skips schema setup on later connects."""
+        scanner = RepoScanner(str(tmp_path))
+        cursor = scanner._conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        assert cursor.fetchone()[0] == qdrepos.SCHEMA_VERSION
+        scanner.close()
+
+        def failing_create_schema(self, cursor):
+            raise AssertionError('schema should not be recreated')
+
+        monkeypatch.setattr(RepoScanner, '_create_schema',
+                            failing_create_schema)
+        scanner = RepoScanner(str(tmp_path))
+        assert len(scanner.get_questions()) == 2
+        scanner.close()
+
+
+class TestScanDirectories:
+    """Tests for RepoScanner.scan_directories() across several repos."""
+
+    def test_first_answer_wins_in_listed_order(self, tmp_path):
+        """Repos are scanned in parallel but stored in dir_list order."""
+        repo_dirs = []
+        for i in range(5):
+            pkg_dir = tmp_path / f'repo{i}' / f'pkg{i}'
+            pkg_dir.mkdir(parents=True)
+            (pkg_dir / '__init__.py').write_text(
+                f'def qdo_cmd{i}():\n    """Command {i}."""\n'
+            )
+            (pkg_dir / 'qd_conf.toml').write_text(
+                f'[answers]\nshared.key = "repo{i}"\n'
+            )
+            repo_dirs.append(str(tmp_path / f'repo{i}'))
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        counts = scanner.scan_directories(repo_dirs)
+
+        assert counts['repositories'] == 5
+        assert counts['packages'] == 5
+        assert counts['qdo_functions'] == 5
+        assert counts['conf_answers'] == 1
+        assert scanner.get_answers()['shared.key'] == 'repo0'
+
+        scanner.close()
+
+    def test_answer_file_from_fifo(self, tmp_path):
+        """Answer files that report size 0 (pipes) are still read."""
+        fifo = tmp_path / 'answers.toml'
+        os.mkfifo(fifo)
+
+        def feed():
+            with open(fifo, 'w') as f:
+                f.write('[answers]\nx = 1\n')
+
+        writer = threading.Thread(target=feed)
+        writer.start()
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        try:
+            assert scanner.load_answer_files([str(fifo)]) == 1
+        finally:
+            writer.join()
+        assert scanner.get_answers() == {'answers.x': '1'}
+
+        scanner.close()
+
+    def test_failed_scan_rolls_back(self, tmp_path, monkeypatch):
+        """An error while storing a repo leaves no partial rows behind."""
+        repo_dirs = []
+        for i in range(2):
+            pkg_dir = tmp_path / f'repo{i}' / f'pkg{i}'
+            pkg_dir.mkdir(parents=True)
+            (pkg_dir / '__init__.py').write_text('')
+            repo_dirs.append(str(tmp_path / f'repo{i}'))
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        store_repository = scanner._store_repository
+
+        def failing_store(cursor, repo_scan, counts):
+            if repo_scan.repo_path.name == 'repo1':
+                raise RuntimeError('boom')
+            store_repository(cursor, repo_scan, counts)
+
+        monkeypatch.setattr(scanner, '_store_repository', failing_store)
+        try:
+            scanner.scan_directories(repo_dirs)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('scan_directories should have raised')
+
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM repositories')
+        assert cursor.fetchone()[0] == 0
+        cursor.execute('SELECT COUNT(*) FROM packages')
+        assert cursor.fetchone()[0] == 0
+
+        scanner.close()
+
+    def test_scan_inside_open_transaction(self, tmp_path, monkeypatch):
+        """A caller's open transaction is neither committed nor discarded."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_a():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path))
+        conn = scanner._conn
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO conf_answers "
+                       "(conf_key, conf_value, yaml_path) "
+                       "VALUES ('caller.key', 'x', 'caller.toml')")
+        assert conn.in_transaction
+
+        def failing_store_qdo_cache(cursor):
+            raise RuntimeError('boom')
+
+        monkeypatch.setattr(scanner, '_store_qdo_cache',
+                            failing_store_qdo_cache)
+        try:
+            scanner.scan_directories([str(tmp_path / 'repo')])
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('scan_directories should have raised')
+        assert conn.in_transaction
+        cursor.execute('SELECT COUNT(*) FROM packages')
+        assert cursor.fetchone()[0] == 0
+        assert scanner.get_answers() == {'caller.key': 'x'}
+
+        monkeypatch.undo()
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        assert conn.in_transaction
+        conn.rollback()
+        assert scanner.get_answers() == {}
+        cursor.execute('SELECT COUNT(*) FROM packages')
+        assert cursor.fetchone()[0] == 0
+
+        scanner.close()
+
+    def test_qdo_functions_found_in_nested_modules(self, tmp_path):
+        """qdo_* functions are collected from every .py file in a package."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        (pkg_dir / 'sub').mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        (pkg_dir / 'sub' / 'tools.py').write_text(
+            'def qdo_build(target, force=False, *args, **kwargs):\n'
+            '    """Build a target."""\n'
+            '\n'
+            'def helper():\n'
+            '    pass\n'
+        )
+        (pkg_dir / 'sub' / 'notes.txt').write_text('def qdo_ignored(): pass\n')
+        (pkg_dir / '.venv' / 'lib').mkdir(parents=True)
+        (pkg_dir / '.venv' / 'lib' / 'vendored.py').write_text(
+            'def qdo_vendored():\n    pass\n'
+        )
+        (pkg_dir / 'node_modules').mkdir()
+        (pkg_dir / 'node_modules' / 'gen.py').write_text(
+            'def qdo_generated():\n    pass\n'
+        )
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert counts['qdo_functions'] == 1
+
+        cursor = scanner._conn.cursor()
+        cursor.execute(
+            'SELECT path, full_name, parameters, docstring FROM qdo'
+        )
+        assert cursor.fetchall() == [(
+            str(pkg_dir / 'sub' / 'tools.py'), 'pkg.qdo_build',
+            'target, force=False, *args, **kwargs', 'Build a target.'
+        )]
+
+        scanner.close()
+
+    def test_skipped_directories(self, tmp_path):
+        """Hidden, build and virtualenv directories are not scanned."""
+        repo_dir = tmp_path / 'repo'
+        for rel in ('pkg', '.hidden/pkg_hidden', 'build/pkg_build',
+                    'venv/pkg_venv', '_private/pkg_private'):
+            pkg_dir = repo_dir / rel
+            pkg_dir.mkdir(parents=True)
+            (pkg_dir / '__init__.py').write_text('')
+        (repo_dir / 'venv' / 'pyvenv.cfg').write_text('')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        counts = scanner.scan_directories([str(repo_dir)])
+        assert counts['packages'] == 1
+
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT package FROM packages')
+        assert cursor.fetchall() == [('pkg',)]
+
+        scanner.close()
+
+    def test_unchanged_files_are_not_reparsed(self, tmp_path, monkeypatch):
+        """The qdo_cache serves unchanged files; edited files are reparsed."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_one():\n    pass\n')
+        (pkg_dir / 'more.py').write_text('def qdo_two():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        parse_qdo_functions = qdrepos._parse_qdo_functions
+        parsed = []
+
+        def counting_parse(source):
+            parsed.append(source)
+            return parse_qdo_functions(source)
+
+        monkeypatch.setattr(qdrepos, '_parse_qdo_functions', counting_parse)
+
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        assert len(parsed) == 2
+
+        parsed.clear()
+        (pkg_dir / 'more.py').write_text('def qdo_three():\n    pass\n')
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert len(parsed) == 1
+        assert counts['qdo_functions'] == 2
+
+        scanner.close()
+
+    def test_files_without_qdo_defs_are_not_parsed(self, tmp_path,
+                                                   monkeypatch):
+        """Files that only mention qdo_ names never reach the parser."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text(
+            'from .cmds import qdo_run\n'
+            'COMMANDS = {"run": qdo_run}\n'
+        )
+        (pkg_dir / 'cmds.py').write_text(
+            'class Commands:\n'
+            '\tdef  qdo_stop(self):\n'
+            '\t\tpass\n'
+            '\n'
+            'def qdo_run():\n'
+            '    pass\n'
+        )
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        parse_qdo_functions = qdrepos._parse_qdo_functions
+        parsed = []
+
+        def counting_parse(source):
+            parsed.append(source)
+            return parse_qdo_functions(source)
+
+        monkeypatch.setattr(qdrepos, '_parse_qdo_functions', counting_parse)
+
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert len(parsed) == 1
+        assert counts['qdo_functions'] == 2
+
+        scanner.close()
+
+    def test_qdo_def_after_utf8_bom(self, tmp_path):
+        """A qdo_* def on the first line of a BOM-prefixed file is found."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        (pkg_dir / 'cmds.py').write_bytes(
+            b'\xef\xbb\xbfdef qdo_run():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert counts['qdo_functions'] == 1
+
+        scanner.close()
+
+    def test_unchanged_qd_conf_toml_is_not_reread(self, tmp_path,
+                                                  monkeypatch):
+        """Parsed qd_conf.toml files are reused until the file changes."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        conf_toml = pkg_dir / 'qd_conf.toml'
+        conf_toml.write_text('[answers]\npkg.key = "one"\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        read_toml = qdrepos._read_toml
+        read = []
+
+        def counting_read(toml_path):
+            read.append(toml_path)
+            return read_toml(toml_path)
+
+        monkeypatch.setattr(qdrepos, '_read_toml', counting_read)
+
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        assert len(read) == 1
+
+        conf_toml.write_text('[answers]\npkg.other = "three"\n')
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert len(read) == 2
+        assert counts['conf_answers'] == 1
+        assert scanner.get_answers()['pkg.other'] == 'three'
+
+        scanner.close()
+
+    def test_duplicate_questions_counted_once(self, tmp_path):
+        """The first repo to define a question wins; duplicates aren't counted."""
+        repo_dirs = []
+        for i in range(2):
+            pkg_dir = tmp_path / f'repo{i}' / f'pkg{i}'
+            pkg_dir.mkdir(parents=True)
+            (pkg_dir / '__init__.py').write_text('')
+            (pkg_dir / 'qd_conf.toml').write_text(
+                '[questions.shared.path]\n'
+                f'help = "From repo{i}"\n'
+                f'[questions.pkg{i}.enabled]\n'
+                'conf_type = "boolean"\n'
+            )
+            repo_dirs.append(str(tmp_path / f'repo{i}'))
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        counts = scanner.scan_directories(repo_dirs)
+        assert counts['conf_questions'] == 3
+
+        questions = {q.conf_key: q for q in scanner.get_questions()}
+        assert questions['shared.path'].conf_help == 'From repo0'
+        assert questions['pkg1.enabled'].is_boolean
+
+        scanner.close()
+
+    def test_removed_qdo_functions_are_deleted(self, tmp_path):
+        """A rescan drops qdo rows for functions no longer defined."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        (pkg_dir / 'cmds.py').write_text(
+            'def qdo_one():\n    pass\n\ndef qdo_two():\n    pass\n'
+        )
+        other_dir = tmp_path / 'other' / 'otherpkg'
+        other_dir.mkdir(parents=True)
+        (other_dir / '__init__.py').write_text('def qdo_other():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        scanner.scan_directories([str(tmp_path / 'repo'),
+                                  str(tmp_path / 'other')])
+
+        (pkg_dir / 'cmds.py').write_text('def qdo_one():\n    pass\n')
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT full_name FROM qdo ORDER BY full_name')
+        assert cursor.fetchall() == [('otherpkg.qdo_other',), ('pkg.qdo_one',)]
+
+        scanner.close()
+
+    def test_unreadable_files_keep_qdo_rows(self, tmp_path, monkeypatch):
+        """A file that can't be read on a rescan keeps its qdo rows."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_init():\n    pass\n')
+        cmds_py = pkg_dir / 'cmds.py'
+        cmds_py.write_text('def qdo_one():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        # Changed on disk, so the rescan has to read it, but unreadable
+        cmds_py.write_text('def qdo_one():\n    pass\n\n\n')
+        real_open = open
+
+        def failing_open(file, *args, **kwargs):
+            if str(file) == str(cmds_py):
+                raise PermissionError(13, 'Permission denied', str(file))
+            return real_open(file, *args, **kwargs)
+
+        monkeypatch.setattr('builtins.open', failing_open)
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT full_name FROM qdo ORDER BY full_name')
+        assert cursor.fetchall() == [('pkg.qdo_init',), ('pkg.qdo_one',)]
+
+        scanner.close()
+
+    def test_deleted_files_leave_qdo_cache(self, tmp_path):
+        """qdo_cache entries for deleted files are dropped by a rescan."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        (pkg_dir / 'cmds.py').write_text('def qdo_one():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        (pkg_dir / 'cmds.py').unlink()
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT path FROM qdo_cache')
+        assert cursor.fetchall() == [(str(pkg_dir / '__init__.py'),)]
+        cursor.execute('SELECT COUNT(*) FROM qdo')
+        assert cursor.fetchone()[0] == 0
+
+        scanner.close()
+
+    def test_unchanged_files_are_not_read(self, tmp_path, monkeypatch):
+        """Files whose mtime and size match the qdo_cache are not opened."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        (pkg_dir / 'cmds.py').write_text('def qdo_one():\n    pass\n')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        opened = []
+        real_open = open
+
+        def counting_open(file, *args, **kwargs):
+            if str(file).endswith('.py'):
+                opened.append(str(file))
+            return real_open(file, *args, **kwargs)
+
+        monkeypatch.setattr('builtins.open', counting_open)
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert opened == []
+        assert counts['qdo_functions'] == 1
+
+        (pkg_dir / 'cmds.py').write_text('def qdo_two(x):\n    pass\n')
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert opened == [str(pkg_dir / 'cmds.py')]
+        assert counts['qdo_functions'] == 1
+
+        scanner.close()
+
+    def test_only_module_and_class_level_qdo_functions(self, tmp_path):
+        """Functions nested inside other functions are not qdo commands."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text(
+            'def qdo_top():\n'
+            '    def qdo_nested():\n'
+            '        pass\n'
+            '\n'
+            'class Commands:\n'
+            '    def qdo_method(self):\n'
+            '        pass\n'
+        )
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        scanner.scan_directories([str(tmp_path / 'repo')])
+
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT function_name FROM qdo ORDER BY function_name')
+        assert [row[0] for row in cursor] == ['qdo_method', 'qdo_top']
+
+        scanner.close()
+
+    def test_symlinked_files_are_scanned(self, tmp_path):
+        """Symlinked .py files count for qdo and Flask detection."""
+        shared_dir = tmp_path / 'shared'
+        shared_dir.mkdir()
+        (shared_dir / 'routes.py').write_text(
+            'bp = Blueprint("bp", __name__)\n\ndef qdo_run():\n    pass\n'
+        )
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('')
+        (pkg_dir / 'routes.py').symlink_to(shared_dir / 'routes.py')
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        counts = scanner.scan_directories([str(tmp_path / 'repo')])
+        assert counts['qdo_functions'] == 1
+        cursor = scanner._conn.cursor()
+        cursor.execute('SELECT isflaskbp FROM packages')
+        assert cursor.fetchall() == [(1,)]
+
+        scanner.close()
+
+    def test_flask_detection(self, tmp_path):
+        """Flask apps and blueprints are flagged from their marker calls."""
+        repo_dir = tmp_path / 'repo'
+        for name, source in (
+                ('apppkg', 'from flask import Flask\napp = Flask(__name__)\n'),
+                ('bppkg', 'import flask\nbp = flask.Blueprint("bp", __name__)\n'),
+                ('plainpkg', 'FLASK = None\n')):
+            (repo_dir / name).mkdir(parents=True)
+            (repo_dir / name / '__init__.py').write_text(source)
+        # Only the package's own top-level modules count
+        (repo_dir / 'plainpkg' / 'sub').mkdir()
+        (repo_dir / 'plainpkg' / 'sub' / 'views.py').write_text(
+            'bp = Blueprint("bp", __name__)\n'
+        )
+
+        scanner = RepoScanner(str(tmp_path), in_memory=True)
+        cursor = scanner._conn.cursor()
+        # The second scan is served from the qdo_cache
+        for _ in range(2):
+            scanner.scan_directories([str(repo_dir)])
+            cursor.execute(
+                'SELECT package, isflask, isflaskbp FROM packages '
+                'ORDER BY package'
+            )
+            assert cursor.fetchall() == [
+                ('apppkg', 1, 0), ('bppkg', 0, 1), ('plainpkg', 0, 0)
+            ]
+
+        scanner.close()
+
+
+class TestQdoLookup:
+    """Tests for the module-level get_qdo_functions()/get_qdo_function()."""
+
+    def test_lookup_from_repos_db(self, tmp_path):
+        site_dir = tmp_path / 'my site'
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text(
+            'def qdo_deploy(env="prod"):\n    """Deploy."""\n'
+        )
+
+        scanner = RepoScanner(str(site_dir))
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        scanner.close()
+
+        functions = get_qdo_functions(str(site_dir))
+        assert [f['full_name'] for f in functions] == ['pkg.qdo_deploy']
+
+        func = get_qdo_function(str(site_dir), 'deploy')
+        assert func['parameters'] == "env='prod'"
+        assert func['docstring'] == 'Deploy.'
+        assert get_qdo_function(str(site_dir), 'missing') is None
+
+    def test_lookup_sees_rescan(self, tmp_path):
+        """Cached lookups are dropped once a rescan commits."""
+        site_dir = tmp_path / 'site'
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_one():\n    pass\n')
+
+        scanner = RepoScanner(str(site_dir))
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        assert get_qdo_function(str(site_dir), 'two') is None
+        assert len(get_qdo_functions(str(site_dir))) == 1
+
+        (pkg_dir / 'more.py').write_text('def qdo_two():\n    pass\n')
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        scanner.close()
+
+        assert get_qdo_function(str(site_dir), 'two')['full_name'] == \
+            'pkg.qdo_two'
+        assert len(get_qdo_functions(str(site_dir))) == 2
+
+    def test_lookup_misses_are_not_cached(self, tmp_path):
+        """Only found functions are kept in the reader's by_name cache."""
+        site_dir = tmp_path / 'site'
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_one():\n    pass\n')
+
+        scanner = RepoScanner(str(site_dir))
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        scanner.close()
+
+        for i in range(3):
+            assert get_qdo_function(str(site_dir), f'missing{i}') is None
+        assert get_qdo_function(str(site_dir), 'one')['full_name'] == \
+            'pkg.qdo_one'
+        reader = qdrepos._repos_db_readers[
+            os.path.realpath(site_dir / 'conf' / 'repos.db')]
+        assert list(reader.by_name) == ['qdo_one']
+
+    def test_lookup_sees_rebuilt_repos_db(self, tmp_path):
+        """Deleting and rebuilding repos.db doesn't leave lookups stale."""
+        site_dir = tmp_path / 'site'
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_b():\n    pass\n')
+
+        scanner = RepoScanner(str(site_dir))
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        scanner.close()
+        assert [f['function_name'] for f in get_qdo_functions(str(site_dir))] \
+            == ['qdo_b']
+        old_reader = qdrepos._repos_db_readers[
+            os.path.realpath(site_dir / 'conf' / 'repos.db')]
+
+        for db_file in (site_dir / 'conf').glob('repos.db*'):
+            db_file.unlink()
+        (pkg_dir / '__init__.py').write_text('def qdo_c():\n    pass\n')
+        scanner = RepoScanner(str(site_dir))
+        scanner.scan_directories([str(tmp_path / 'repo')])
+        scanner.close()
+
+        assert [f['function_name'] for f in get_qdo_functions(str(site_dir))] \
+            == ['qdo_c']
+        assert get_qdo_function(str(site_dir), 'c')['full_name'] == 'pkg.qdo_c'
+        assert old_reader.conn is None
+
+    def test_evicted_readers_are_closed(self, tmp_path, monkeypatch):
+        """Readers beyond REPOS_DB_READERS_MAX are closed, not leaked."""
+        pkg_dir = tmp_path / 'repo' / 'pkg'
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / '__init__.py').write_text('def qdo_one():\n    pass\n')
+        site_dirs = [tmp_path / 'site0', tmp_path / 'site1']
+        for site_dir in site_dirs:
+            scanner = RepoScanner(str(site_dir))
+            scanner.scan_directories([str(tmp_path / 'repo')])
+            scanner.close()
+
+        monkeypatch.setattr(qdrepos, 'REPOS_DB_READERS_MAX', 1)
+        assert len(get_qdo_functions(str(site_dirs[0]))) == 1
+        db_path = os.path.realpath(site_dirs[0] / 'conf' / 'repos.db')
+        first_reader = qdrepos._repos_db_readers[db_path]
+        assert len(get_qdo_functions(str(site_dirs[1]))) == 1
+        assert first_reader.conn is None
+        assert db_path not in qdrepos._repos_db_readers
+
+        # Reopened on demand
+        assert get_qdo_function(str(site_dirs[0]), 'one') is not None
+
+    def test_lookup_without_repos_db(self, tmp_path):
+        assert get_qdo_functions(str(tmp_path)) == []
+        assert get_qdo_function(str(tmp_path), 'deploy') is None
+
+
+class TestParseQdoFunctions:
+    """Tests for qdo_* signature and docstring extraction."""
+
+    def test_parameters_and_docstring(self):
+        source = (
+            b'def qdo_run(a, b=1, c="x", d=None, e=-1, f=[1, 2], g=make(),\n'
+            b'            *args, **kwargs):\n'
+            b'    """\n'
+            b'    Run things.\n'
+            b'\n'
+            b'        Indented detail.\n'
+            b'    """\n'
+            b'\n'
+            b'def qdo_plain():\n'
+            b'    pass\n'
+        )
+        functions = qdrepos._parse_qdo_functions(source)
+        assert functions == [
+            {'name': 'qdo_run',
+             'parameters': "a, b=1, c='x', d=None, e=-1, f=[1, 2], g=make(), "
+                           "*args, **kwargs",
+             'docstring': 'Run things.\n\n    Indented detail.'},
+            {'name': 'qdo_plain', 'parameters': '', 'docstring': ''},
+        ]
+
+    def test_positional_and_keyword_only(self):
+        functions = qdrepos._parse_qdo_functions(
+            b'def qdo_pos(a=1, /, b: int = 2, *, c, d=MAX):\n    pass\n'
+        )
+        assert functions[0]['parameters'] == 'a=1, /, b: int=2, *, c, d=MAX'
+
+    def test_syntax_error_yields_nothing(self):
+        assert qdrepos._parse_qdo_functions(b'def qdo_broken(:\n') == []
@@ -0,0 +1,113 @@
+"""
+Tests for qdcore.qdsetup - package scaffolding.
+"""
+
+import os
+
+from qdcore import qdsetup
+from qdcore.qdsetup import PackageResult, create_package
+
+
+class TestMakeDirsBatch:
+    """Tests for _make_dirs_batch()."""
+
+    def test_parents_created_first(self, tmp_path):
+        """Nested paths in any order, with duplicates, are made once each."""
+        top = str(tmp_path / 'a')
+        mid = os.path.join(top, 'b')
+        leaf = os.path.join(mid, 'c')
+        result = PackageResult()
+        qdsetup._make_dirs_batch([leaf, top, mid, leaf], result)
+
+        assert result.errors == []
+        assert result.dirs_created == [top, mid, leaf]
+        assert os.path.isdir(leaf)
+
+    def test_existing_dirs_are_skipped(self, tmp_path):
+        existing = tmp_path / 'existing'
+        existing.mkdir()
+        new = str(existing / 'new')
+        result = PackageResult()
+        qdsetup._make_dirs_batch([str(existing), new], result)
+
+        assert result.errors == []
+        assert result.dirs_created == [new]
+
+    def test_failures_are_recorded(self, tmp_path):
+        blocker = tmp_path / 'file'
+        blocker.write_text('')
+        result = PackageResult()
+        qdsetup._make_dirs_batch([str(blocker / 'sub')], result)
+
+        assert result.dirs_created == []
+        assert len(result.errors) == 1
+        assert 'Failed to create directory' in result.errors[0]
+
+
+class TestCreatePackage:
+    """Tests for create_package()."""
+
+    def test_library_package(self, tmp_path):
+        result = create_package(str(tmp_path), 'qdlib', is_flask=False)
+        pkg_root = str(tmp_path / 'qdlib')
+        src_pkg = os.path.join(pkg_root, 'src', 'qdlib')
+
+        assert result.success
+        assert result.errors == []
+        assert result.package_path == pkg_root
+        assert result.dirs_created == [
+            pkg_root, os.path.join(pkg_root, 'src'), src_pkg
+        ]
+        assert sorted(result.files_created) == sorted([
+            os.path.join(pkg_root, 'setup.py'),
+            os.path.join(pkg_root, 'README.md'),
+            os.path.join(src_pkg, '__init__.py'),
+            os.path.join(src_pkg, 'qd_conf.toml'),
+        ])
+        for path in result.files_created:
+            assert os.path.isfile(path)
+
+    def test_flask_package_nested_dirs(self, tmp_path):
+        result = create_package(str(tmp_path), 'qdfoo', is_flask=True)
+        src_pkg = os.path.join(str(tmp_path), 'qdfoo', 'src', 'qdfoo')
+
+        assert result.success
+        for sub in ('conf', 'static', 'templates',
+                    os.path.join('templates', 'qdfoo')):
+            assert os.path.join(src_pkg, sub) in result.dirs_created
+            assert os.path.isdir(os.path.join(src_pkg, sub))
+        assert len(result.dirs_created) == len(set(result.dirs_created))
+        assert os.path.isfile(
+            os.path.join(src_pkg, 'templates', 'qdfoo', '.gitkeep'))
+        assert os.path.isfile(
+            os.path.join(src_pkg, 'conf', 'qdfoo.yaml.example'))
+        for path in result.files_created:
+            assert os.path.isfile(path)
+
+    def test_existing_package_is_not_overwritten(self, tmp_path):
+        pkg_root = tmp_path / 'qdlib'
+        pkg_root.mkdir()
+        (pkg_root / 'setup.py').write_text('# mine\n')
+
+        result = create_package(str(tmp_path), 'qdlib', is_flask=False)
+
+        assert not result.success
+        assert result.errors == [
+            f"'{pkg_root}' already exists; will not overwrite"
+        ]
+        assert result.package_path == ''
+        assert result.files_created == []
+        assert (pkg_root / 'setup.py').read_text() == '# mine\n'
+
+    def test_root_mkdir_failure(self, tmp_path, monkeypatch):
+        def failing_mkdir(path, *args, **kwargs):
+            raise PermissionError(13, 'Permission denied', path)
+
+        monkeypatch.setattr(qdsetup.os, 'mkdir', failing_mkdir)
+        result = create_package(str(tmp_path), 'qdlib', is_flask=False)
+
+        assert not result.success
+        assert result.package_path == str(tmp_path / 'qdlib')
+        assert len(result.errors) == 1
+        assert 'Failed to create directory' in result.errors[0]
+        assert result.files_created == []
@@ -142,6 +142,19 @@ class TestExpandAnswerRefs:
         )
         assert result == '<unknown.key>/file.db'
 
+    def test_unresolvable_in_conf_left_as_is(self, tmp_path):
+        """Refs missing from conf, including non-dotted ones, are kept."""
+        conf_dir = tmp_path / 'conf'
+        conf_dir.mkdir()
+        qdos.write_toml(str(conf_dir / 'trellis.toml'),
+                        {'content_dpath': '/srv/content'})
+        conf = qdconf.QdConf(str(conf_dir))
+
+        result = qdstart.expand_answer_refs(
+            '<trellis.missing>/<nodots>/<other.key>', {}, conf
+        )
+        assert result == '<trellis.missing>/<nodots>/<other.key>'
+
     def test_multiple_refs(self):
         """Multiple references in one string are all expanded."""
         cache = {'a.x': 'hello', 'b.y': 'world'}